@@ -0,0 +1,85 @@
+"""
+Регулярные выражения для happy_docx: общий кэш скомпилированных выражений
+и функции, которые выполняются в рабочем процессе защищенного режима.
+
+Модуль не имеет побочных эффектов при импорте и зависит только от стандартной
+библиотеки (и необязательного re2), поэтому рабочий процесс загружает его быстро.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+try:
+    import re2  # линейный движок регулярных выражений (pip install google-re2)
+except ImportError:
+    re2 = None
+
+# Максимальное число скомпилированных выражений в кэше
+REGEX_CACHE_SIZE = 256
+
+_regex_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_regex_cache_lock = threading.Lock()
+
+# Конструкции, которые в re2 работают только с ASCII (\w, \b, \d, \s и их отрицания)
+# или иначе трактуют конец строки ($ не совпадает перед завершающим \n)
+_RE2_ASCII_CONSTRUCTS = re.compile(r"\\[wWbBdDsS]|\$")
+
+def compile_pattern(pattern: str, engine: str = "re") -> tuple:
+    """
+    Компилирует регулярное выражение, используя общий кэш процесса.
+    
+    В re2 классы \\w, \\b, \\d, \\s работают только с ASCII, поэтому на кириллице
+    выражения вроде \\w+ ведут себя иначе, чем в re. Режим "auto" использует re2
+    только для выражений без таких конструкций; "re2" включает его безусловно.
+    
+    Args:
+        pattern: Регулярное выражение
+        engine: Движок: "re" (по умолчанию), "auto" (re2, если установлен и семантика совпадает) или "re2"
+        
+    Returns:
+        Кортеж (скомпилированное выражение, имя использованного движка)
+    """
+    key = (pattern, engine)
+    with _regex_cache_lock:
+        cached = _regex_cache.get(key)
+        if cached is not None:
+            _regex_cache.move_to_end(key)
+            return cached
+    
+    compiled = None
+    use_re2 = engine == "re2" or (engine == "auto" and not _RE2_ASCII_CONSTRUCTS.search(pattern))
+    if use_re2 and re2 is not None:
+        try:
+            compiled = (re2.compile(pattern), "re2")
+        except Exception:
+            # re2 не поддерживает обратные ссылки и lookaround - откатываемся на re
+            compiled = None
+    if compiled is None:
+        compiled = (re.compile(pattern), "re")
+    
+    with _regex_cache_lock:
+        _regex_cache[key] = compiled
+        _regex_cache.move_to_end(key)
+        while len(_regex_cache) > REGEX_CACHE_SIZE:
+            _regex_cache.popitem(last=False)
+    return compiled
+
+def substitute(pattern: str, engine: str, replacement: str, texts: List[str]) -> List[str]:
+    """Выполняет замену во всех строках; вызывается в рабочем процессе защищенного режима."""
+    compiled, _ = compile_pattern(pattern, engine)
+    return [compiled.sub(replacement, text) for text in texts]
+
+def search_offsets(pattern: str, engine: str, text: str, limit: Optional[int]) -> List[int]:
+    """Возвращает позиции не более limit совпадений выражения в тексте."""
+    compiled, _ = compile_pattern(pattern, engine)
+    offsets = []
+    for match in compiled.finditer(text):
+        offsets.append(match.start())
+        if limit is not None and len(offsets) >= limit:
+            break
+    return offsets
+
+def ping() -> bool:
+    """Пустая задача, которой дожидаются запуска рабочего процесса."""
+    return True
@@ -2,10 +2,33 @@ from mcp.server.fastmcp import FastMCP
 import sys
 import os
 import re
+import time
+import threading
+import contextlib
+import functools
+import hashlib
+import mmap
+import posixpath
+import shutil
+import struct
+import tempfile
+import multiprocessing
+import tracemalloc
+import zlib
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
+from collections import OrderedDict
 from docx import Document
 import PyPDF2
 from typing import Dict, List, Any, Union, Optional
 import json
+from docx_regex import compile_pattern, ping, search_offsets, substitute
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 
 mcp = FastMCP("docx-filesystem")
@@ -13,10 +36,172 @@ mcp = FastMCP("docx-filesystem")
 
 allowed_paths = sys.argv[1:] if len(sys.argv) > 1 else ['.']
 
+class PathPolicy:
+    """
+    Политика доступа к путям, построенная один раз при запуске сервера.
+    
+    Разрешенные корни нормализуются и разрешаются через realpath, а затем
+    хранятся в префиксном дереве по компонентам пути. Поэтому корень /docs
+    не открывает доступ к /docs-private, а символическая ссылка внутри
+    разрешенного каталога не ведет за его пределы.
+    """
+
+    def __init__(self, roots: List[str]):
+        self._trie = {}
+        for root in roots:
+            node = self._trie
+            for component in self._components(os.path.realpath(os.path.abspath(root))):
+                node = node.setdefault(component, {})
+            node[None] = True
+
+    @staticmethod
+    def _components(path: str) -> List[str]:
+        return [part for part in os.path.normcase(path).split(os.sep) if part]
+
+    def _matches(self, real_path: str) -> bool:
+        node = self._trie
+        if None in node:
+            return True
+        for component in self._components(real_path):
+            node = node.get(component)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+    @staticmethod
+    def _real_path(path: str, resolved_dirs: Dict[str, str]) -> str:
+        """Разрешает путь, переиспользуя уже разрешенные в этом пакете каталоги."""
+        absolute = os.path.abspath(path)
+        if os.path.islink(absolute):
+            return os.path.realpath(absolute)
+        directory, name = os.path.split(absolute)
+        real_directory = resolved_dirs.get(directory)
+        if real_directory is None:
+            real_directory = resolved_dirs[directory] = os.path.realpath(directory)
+        return os.path.join(real_directory, name)
+
+    def is_allowed(self, path: str) -> bool:
+        """Проверяет, находится ли путь (после разрешения символических ссылок) в разрешенных корнях."""
+        # Символические ссылки разрешаются при каждом вызове: они могут измениться.
+        # Результат не кэшируется: обход дерева дешевле realpath и блокировки.
+        return self._matches(os.path.realpath(os.path.abspath(path)))
+
+    def allowed_many(self, paths: List[str]) -> List[bool]:
+        """Проверяет список путей, разрешая каждый каталог только один раз."""
+        resolved_dirs = {}
+        return [self._matches(self._real_path(path, resolved_dirs)) for path in paths]
+
+path_policy = PathPolicy(allowed_paths)
+
 def is_path_allowed(path: str) -> bool:
     """Проверяет, находится ли путь в разрешенных директориях."""
-    path = os.path.abspath(path)
-    return any(path.startswith(os.path.abspath(allowed)) for allowed in allowed_paths)
+    return path_policy.is_allowed(path)
+
+# Бюджет времени (в секундах) на все регулярные замены одного вызова
+REGEX_TIME_BUDGET = 5.0
+# Выражения, работавшие дольше этого порога (в секундах), попадают в отчет
+REGEX_SLOW_THRESHOLD = 0.5
+
+class RegexTimeoutError(Exception):
+    """Регулярное выражение не уложилось в отведенный бюджет времени."""
+
+    def __init__(self, pattern: str, timeout: float):
+        super().__init__(pattern, timeout)
+        self.pattern = pattern
+        self.timeout = timeout
+
+class GuardedRegexRunner:
+    """
+    Выполняет операции с регулярными выражениями в рамках общего бюджета времени.
+    
+    Бюджет расходуется только временем внутри run, поэтому работа между
+    вызовами (например, извлечение текста страниц PDF) его не уменьшает.
+    Выражения, скомпилированные re2, выполняются за линейное время прямо в процессе сервера.
+    Выражения на движке re выполняются в отдельном процессе, который завершается
+    при превышении бюджета времени.
+    """
+
+    def __init__(self, engine: str = "re", timeout: float = None):
+        self.engine = engine
+        self.timeout = REGEX_TIME_BUDGET if timeout is None else timeout
+        self.spent = 0.0
+        self.last_elapsed = 0.0
+        self._pool = None
+
+    def run(self, worker, pattern: str, *args):
+        """
+        Вызывает worker(pattern, engine, *args) с учетом оставшегося бюджета.
+        
+        Raises:
+            RegexTimeoutError: если выражение не уложилось в бюджет времени
+        """
+        _, used_engine = compile_pattern(pattern, self.engine)
+        remaining = self.timeout - self.spent
+        if remaining <= 0:
+            raise RegexTimeoutError(pattern, self.timeout)
+        
+        if used_engine != "re2" and self._pool is None:
+            self._pool = multiprocessing.Pool(processes=1)
+            # Запуск рабочего процесса (при spawn это импорт модулей) не входит в бюджет
+            self._pool.apply(ping)
+        
+        started = time.monotonic()
+        try:
+            if used_engine == "re2":
+                return worker(pattern, self.engine, *args)
+            
+            async_result = self._pool.apply_async(worker, (pattern, self.engine) + args)
+            try:
+                return async_result.get(timeout=remaining)
+            except multiprocessing.TimeoutError:
+                self._pool.terminate()
+                self._pool = None
+                raise RegexTimeoutError(pattern, self.timeout)
+        finally:
+            self.last_elapsed = time.monotonic() - started
+            self.spent += self.last_elapsed
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def run_guarded_substitutions(texts: List[str], patterns: List[tuple], engine: str = "re", timeout: float = None) -> tuple[List[str], List[tuple]]:
+    """
+    Применяет регулярные замены к списку строк с ограничением по времени.
+    
+    Args:
+        texts: Исходные строки
+        patterns: Список пар (регулярное выражение, замена)
+        engine: Движок регулярных выражений ("re", "auto" или "re2")
+        timeout: Бюджет времени на все замены в секундах
+        
+    Returns:
+        Кортеж (измененные строки, список медленных выражений в виде пар (выражение, секунды))
+        
+    Raises:
+        RegexTimeoutError: если выражение не уложилось в бюджет времени
+    """
+    slow_patterns = []
+    with GuardedRegexRunner(engine, timeout) as runner:
+        for pattern, replacement in patterns:
+            if not texts:
+                break
+            texts = runner.run(substitute, pattern, replacement, texts)
+            if runner.last_elapsed >= REGEX_SLOW_THRESHOLD:
+                slow_patterns.append((pattern, runner.last_elapsed))
+    
+    return texts, slow_patterns
 
 def validate_file_path(file_path: str, should_exist: bool = True) -> tuple[bool, str]:
     """
@@ -29,7 +214,24 @@ def validate_file_path(file_path: str, should_exist: bool = True) -> tuple[bool,
     Returns:
         Кортеж (успех, сообщение об ошибке)
     """
-    if not is_path_allowed(file_path):
+    return _check_file_path(file_path, should_exist, is_path_allowed(file_path))
+
+def validate_many(file_paths: List[str], should_exist: bool = True) -> List[tuple[bool, str]]:
+    """
+    Проверяет валидность списка путей к файлам для инструментов, работающих с несколькими файлами.
+    
+    Args:
+        file_paths: Пути к файлам
+        should_exist: Должны ли файлы существовать
+        
+    Returns:
+        Список кортежей (успех, сообщение об ошибке) в порядке путей
+    """
+    verdicts = path_policy.allowed_many(file_paths)
+    return [_check_file_path(path, should_exist, allowed) for path, allowed in zip(file_paths, verdicts)]
+
+def _check_file_path(file_path: str, should_exist: bool, allowed: bool) -> tuple[bool, str]:
+    if not allowed:
         return False, f"Ошибка: Доступ к {file_path} запрещен. Разрешены только пути: {', '.join(allowed_paths)}"
     
     if should_exist and not os.path.exists(file_path):
@@ -37,29 +239,332 @@ def validate_file_path(file_path: str, should_exist: bool = True) -> tuple[bool,
     
     return True, ""
 
+# Бюджет памяти (в мегабайтах) на обработку одного документа
+MEMORY_BUDGET_MB = float(os.environ.get("DOCX_MEMORY_BUDGET_MB", "256"))
+# Во сколько раз объектная модель python-docx больше несжатого XML
+DOM_MEMORY_FACTOR = 8
+# Сообщать ли о пиковом потреблении памяти каждого вызова (в stderr)
+REPORT_PEAK_MEMORY = os.environ.get("DOCX_REPORT_MEMORY", "0") == "1"
+
+def estimate_docx_memory(file_path: str) -> int:
+    """
+    Оценивает объем памяти, необходимый python-docx для загрузки документа.
+    
+    Оценка строится по несжатым размерам частей zip-архива без их распаковки:
+    XML-части разворачиваются в дерево lxml, бинарные части загружаются как есть.
+    
+    Args:
+        file_path: Путь к DOCX-файлу
+        
+    Returns:
+        Оценка в байтах
+    """
+    estimate = 0
+    with zipfile.ZipFile(file_path) as archive:
+        for info in archive.infolist():
+            if info.filename.endswith((".xml", ".rels")):
+                estimate += info.file_size * DOM_MEMORY_FACTOR
+            else:
+                estimate += info.file_size
+    return estimate
+
+def fits_memory_budget(file_path: str) -> tuple[bool, str]:
+    """
+    Проверяет, укладывается ли загрузка документа в бюджет памяти.
+    
+    Returns:
+        Кортеж (укладывается, сообщение об ошибке)
+    """
+    estimate = estimate_docx_memory(file_path)
+    if estimate > MEMORY_BUDGET_MB * 1024 * 1024:
+        return False, (
+            f"Ошибка: Документ {file_path} слишком велик для обработки "
+            f"(оценка {estimate / (1024 * 1024):.1f} МБ при лимите {MEMORY_BUDGET_MB:g} МБ)."
+        )
+    return True, ""
+
+def _max_rss_mb() -> Optional[float]:
+    """Возвращает пиковый RSS процесса в мегабайтах или None, если он недоступен."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает килобайты, macOS - байты
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+def track_peak_memory(func):
+    """
+    Сообщает в stderr пиковую память за время вызова инструмента.
+    
+    tracemalloc видит только объекты Python, а дерево lxml внутри python-docx
+    выделяется в C-коде, поэтому дополнительно выводится пиковый RSS процесса
+    до и после вызова. RSS - максимум за все время жизни процесса: он растет,
+    только если вызов превысил прежний пик.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not REPORT_PEAK_MEMORY:
+            return await func(*args, **kwargs)
+        
+        rss_before = _max_rss_mb()
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+            message = f"[memory] {func.__name__}: пик Python {peak / (1024 * 1024):.1f} МБ"
+            if rss_before is not None:
+                message += f", пиковый RSS процесса {rss_before:.1f} -> {_max_rss_mb():.1f} МБ"
+            print(message, file=sys.stderr)
+    return wrapper
+
+# Лимит кэша готовых результатов чтения в памяти (в мегабайтах)
+RENDER_CACHE_MB = float(os.environ.get("DOCX_RENDER_CACHE_MB", "64"))
+# Каталог для вытесненных из памяти результатов (по умолчанию не используется)
+RENDER_CACHE_DIR = os.environ.get("DOCX_RENDER_CACHE_DIR") or None
+# Лимит этого каталога (в мегабайтах)
+RENDER_CACHE_DISK_MB = float(os.environ.get("DOCX_RENDER_CACHE_DISK_MB", "256"))
+
+class RenderCache:
+    """
+    Кэш готовых результатов инструментов чтения.
+    
+    Ключ включает хэш содержимого файла и параметры вызова, поэтому после
+    изменения файла старые результаты просто перестают находиться.
+    Записи вытесняются по принципу LRU при превышении лимита в байтах и,
+    если задан каталог, сохраняются на диск. У каталога свой лимит в байтах:
+    самые старые файлы удаляются, а файл, возвращенный в память, удаляется сразу.
+    """
+
+    def __init__(self, max_bytes: int, spill_dir: str = None, max_spill_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._size = 0
+        self._hashes: "OrderedDict[str, tuple]" = OrderedDict()
+        self._spilled: "OrderedDict[str, int]" = OrderedDict()
+        self._spill_size = 0
+        self._spill_loaded = False
+        self._lock = threading.Lock()
+
+    def _load_spill_index(self) -> None:
+        """
+        Учитывает файлы, оставшиеся от предыдущих запусков, от старых к новым.
+        
+        Вызывается под блокировкой при первом обращении к диску, а не при импорте
+        модуля, который также выполняется в рабочих процессах.
+        """
+        self._spill_loaded = True
+        if not os.path.isdir(self.spill_dir):
+            return
+        names = [name for name in os.listdir(self.spill_dir) if name.endswith(".txt")]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.spill_dir, name)))
+        for name in names:
+            size = os.path.getsize(os.path.join(self.spill_dir, name))
+            self._spilled[name] = size
+            self._spill_size += size
+        self._trim_spill()
+
+    def content_hash(self, file_path: str) -> str:
+        """Возвращает SHA-256 содержимого файла, пересчитывая его только при изменении файла."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached is not None and cached[0] == signature:
+                self._hashes.move_to_end(path)
+                return cached[1]
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        
+        with self._lock:
+            self._hashes[path] = (signature, content_hash)
+            self._hashes.move_to_end(path)
+            while len(self._hashes) > 1024:
+                self._hashes.popitem(last=False)
+        return content_hash
+
+    def key(self, file_path: str, view: str, *params) -> tuple:
+        """Строит ключ кэша из хэша содержимого файла, имени представления и параметров."""
+        return (self.content_hash(file_path), view) + params
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+        
+        if not self.spill_dir:
+            return None
+        name = self._spill_name(key)
+        with self._lock:
+            if not self._spill_loaded:
+                self._load_spill_index()
+            if name not in self._spilled:
+                return None
+            path = os.path.join(self.spill_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    value = file.read()
+            except OSError:
+                self._spill_size -= self._spilled.pop(name)
+                return None
+            if sys.getsizeof(value) > self.max_bytes:
+                self._spilled.move_to_end(name)
+                return value
+            # Запись возвращается в память, копия на диске больше не нужна
+            self._spill_size -= self._spilled.pop(name)
+            self._remove_spill_file(name)
+        
+        self.put(key, value)
+        return value
+
+    def put(self, key: tuple, value: str) -> str:
+        """Сохраняет результат в кэше и возвращает его."""
+        size = sys.getsizeof(value)
+        evicted = []
+        if size > self.max_bytes:
+            # Результат больше всего кэша в памяти - сразу отправляем на диск
+            evicted.append((key, value))
+        else:
+            with self._lock:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._size -= sys.getsizeof(previous)
+                self._entries[key] = value
+                self._size += size
+                while self._size > self.max_bytes:
+                    old_key, old_value = self._entries.popitem(last=False)
+                    self._size -= sys.getsizeof(old_value)
+                    evicted.append((old_key, old_value))
+        
+        if self.spill_dir:
+            for old_key, old_value in evicted:
+                self._spill(old_key, old_value)
+        return value
+
+    def _spill(self, key: tuple, value: str) -> None:
+        """Сохраняет вытесненную запись на диск, соблюдая лимит каталога."""
+        data = value.encode('utf-8')
+        if len(data) > self.max_spill_bytes:
+            return
+        
+        name = self._spill_name(key)
+        with self._lock:
+            if not self._spill_loaded:
+                self._load_spill_index()
+            if name in self._spilled:
+                self._spilled.move_to_end(name)
+                return
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(os.path.join(self.spill_dir, name), 'wb') as file:
+                file.write(data)
+            self._spilled[name] = len(data)
+            self._spill_size += len(data)
+            self._trim_spill()
+
+    def _trim_spill(self) -> None:
+        while self._spill_size > self.max_spill_bytes and self._spilled:
+            name, size = self._spilled.popitem(last=False)
+            self._spill_size -= size
+            self._remove_spill_file(name)
+
+    def _remove_spill_file(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.spill_dir, name))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _spill_name(key: tuple) -> str:
+        return hashlib.sha256(repr(key).encode('utf-8')).hexdigest() + ".txt"
+
+render_cache = RenderCache(int(RENDER_CACHE_MB * 1024 * 1024), RENDER_CACHE_DIR, int(RENDER_CACHE_DISK_MB * 1024 * 1024))
+
+@contextlib.contextmanager
+def open_mapped(file):
+    """
+    Отображает открытый файл в память только для чтения.
+    
+    Пустые файлы и файловые системы без поддержки mmap читаются как обычно.
+    """
+    try:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        yield file
+        return
+    try:
+        yield mapped
+    finally:
+        mapped.close()
+
 @mcp.tool()
-async def read_pdf(file_path: str, page_range: str = None, include_metadata: bool = True) -> str:
+@track_peak_memory
+async def read_pdf(
+    file_path: str,
+    page_range: str = None,
+    include_metadata: bool = True,
+    query: str = None,
+    use_regex: bool = False,
+    max_matches: int = None,
+    regex_engine: str = "re"
+) -> str:
     """
     Читает содержимое PDF-файла и возвращает его текст.
+    Если указан query, возвращает только страницы с совпадениями и прекращает
+    чтение, как только найдено max_matches совпадений.
     
     Args:
         file_path: Путь к PDF-файлу
         page_range: Диапазон страниц для извлечения (например, "1-5" или "2,4,6")
         include_metadata: Включать ли метаданные PDF в результат
+        query: Искомый текст (без учета регистра) или регулярное выражение
+        use_regex: Считать query регулярным выражением (True/False)
+        max_matches: Остановить чтение после указанного количества совпадений
+        regex_engine: Движок регулярных выражений: "re" (по умолчанию), "auto" или "re2" (линейное время, \\w и \\b только ASCII)
     """
     try:
         valid, error_msg = validate_file_path(file_path)
         if not valid:
             return error_msg
         
+        search_pattern = None
+        if query:
+            if max_matches is not None and max_matches <= 0:
+                return f"Ошибка: max_matches должен быть положительным числом, получено {max_matches}."
+            if regex_engine not in ("auto", "re2", "re"):
+                return f"Ошибка: Неизвестный движок регулярных выражений '{regex_engine}'. Допустимые значения: re, auto, re2"
+            search_pattern = query if use_regex else "(?i)" + re.escape(query)
+            try:
+                compile_pattern(search_pattern, regex_engine if use_regex else "re")
+            except re.error as e:
+                return f"Ошибка в регулярном выражении '{query}': {str(e)}"
+        
         try:
             import PyPDF2
         except ImportError:
             return "Ошибка: Для работы с PDF требуется библиотека PyPDF2. Установите её с помощью команды: pip install PyPDF2"
         
+        cache_key = render_cache.key(file_path, "read_pdf", page_range, include_metadata, query, use_regex, max_matches, regex_engine)
+        cached = render_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        with open(file_path, 'rb') as file, open_mapped(file) as stream:
+            # Страницы разбираются лениво из отображенного в память файла
+            reader = PyPDF2.PdfReader(stream)
             
             
             info = reader.metadata
@@ -102,6 +607,41 @@ async def read_pdf(file_path: str, page_range: str = None, include_metadata: boo
                 result.append(f"Количество страниц: {total_pages}")
                 result.append("")
             
+            if search_pattern is not None:
+                result.append(f"=== РЕЗУЛЬТАТЫ ПОИСКА: {query} ===")
+                matches_found = 0
+                pages_found = 0
+                with GuardedRegexRunner(regex_engine) as runner:
+                    for i in sorted(pages_to_extract):
+                        if max_matches is not None and matches_found >= max_matches:
+                            break
+                        if not 0 <= i < total_pages:
+                            continue
+                        
+                        text = reader.pages[i].extract_text() or ""
+                        limit = None if max_matches is None else max_matches - matches_found
+                        if use_regex:
+                            # Выражение от пользователя выполняем с защитой от катастрофического перебора
+                            try:
+                                offsets = runner.run(search_offsets, search_pattern, text, limit)
+                            except RegexTimeoutError as e:
+                                return f"Ошибка: Регулярное выражение '{e.pattern}' не уложилось в лимит {e.timeout:g} с."
+                        else:
+                            offsets = search_offsets(search_pattern, "re", text, limit)
+                        matches_found += len(offsets)
+                        
+                        if offsets:
+                            pages_found += 1
+                            result.append(f"--- Страница {i + 1} (совпадения на позициях: {', '.join(map(str, offsets))}) ---")
+                            result.append(text)
+                            result.append("")
+                
+                if pages_found == 0:
+                    result.append("Совпадений не найдено.")
+                else:
+                    result.append(f"Найдено совпадений: {matches_found} на {pages_found} стр.")
+                return render_cache.put(cache_key, "\n".join(result))
+            
             result.append(f"=== СОДЕРЖИМОЕ ===")
             for i in sorted(pages_to_extract):
                 if 0 <= i < total_pages:
@@ -114,12 +654,13 @@ async def read_pdf(file_path: str, page_range: str = None, include_metadata: boo
                         result.append("[Страница не содержит текста или текст не может быть извлечен]")
                     result.append("")
             
-            return "\n".join(result)
+            return render_cache.put(cache_key, "\n".join(result))
         
     except Exception as e:
         return f"Ошибка при чтении PDF-файла: {str(e)}"
 
 @mcp.tool()
+@track_peak_memory
 async def read_docx(file_path: str, format_type: str = "text", tables_only: bool = False) -> str:
     """
     Reads the contents of a DOCX file and returns its text.
@@ -129,15 +670,25 @@ async def read_docx(file_path: str, format_type: str = "text", tables_only: bool
         if not valid:
             return error_msg
         
+        cache_key = render_cache.key(file_path, "read_docx", format_type.lower(), tables_only)
+        cached = render_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Документы, не укладывающиеся в бюджет памяти, читаем потоково
+        fits, _ = fits_memory_budget(file_path)
+        if not fits:
+            return render_cache.put(cache_key, get_document_streamed(file_path, format_type, tables_only))
+        
         document = Document(file_path)
         
         if tables_only:
-            return get_tables_info(document)
+            return render_cache.put(cache_key, get_tables_info(document))
         
         if format_type.lower() == 'json':
-            return get_document_as_json(document)
+            return render_cache.put(cache_key, get_document_as_json(document))
         
-        return get_document_as_text(document)
+        return render_cache.put(cache_key, get_document_as_text(document))
     
     except Exception as e:
         return f"Ошибка при чтении DOCX-файла: {str(e)}"
@@ -229,13 +780,198 @@ def get_document_as_json(document: Document) -> str:
     
     return json.dumps(result, ensure_ascii=False, indent=2)
 
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+def _main_document_part(archive: zipfile.ZipFile) -> str:
+    """Находит в архиве основную часть документа (обычно word/document.xml)."""
+    try:
+        rels = ET.fromstring(archive.read("_rels/.rels"))
+    except KeyError:
+        return "word/document.xml"
+    
+    for rel in rels.iter(f"{REL_NS}Relationship"):
+        if rel.get("Type") == OFFICE_DOCUMENT_REL:
+            return rel.get("Target").lstrip("/")
+    return "word/document.xml"
+
+def _xml_run_text(run: ET.Element) -> str:
+    """Возвращает текст прогона w:r так же, как run.text в python-docx."""
+    parts = []
+    for child in run:
+        if child.tag == f"{W_NS}t":
+            parts.append(child.text or "")
+        elif child.tag in (f"{W_NS}tab", f"{W_NS}ptab"):
+            parts.append("\t")
+        elif child.tag == f"{W_NS}br":
+            # Разрывы страниц и колонок в текст не попадают
+            if child.get(f"{W_NS}type", "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif child.tag == f"{W_NS}cr":
+            parts.append("\n")
+        elif child.tag == f"{W_NS}noBreakHyphen":
+            parts.append("-")
+    return "".join(parts)
+
+def _xml_paragraph_text(paragraph: ET.Element) -> str:
+    """
+    Возвращает текст абзаца w:p так же, как paragraph.text в python-docx:
+    учитываются только прямые дочерние w:r и w:hyperlink.
+    """
+    parts = []
+    for child in paragraph:
+        if child.tag == f"{W_NS}r":
+            parts.append(_xml_run_text(child))
+        elif child.tag == f"{W_NS}hyperlink":
+            parts.extend(_xml_run_text(run) for run in child.findall(f"{W_NS}r"))
+    return "".join(parts)
+
+def _xml_table_rows(table: ET.Element) -> tuple[List[List[str]], int]:
+    """
+    Возвращает текст ячеек таблицы w:tbl по строкам и количество столбцов.
+    
+    Объединенные ячейки повторяются, как в row.cells python-docx.
+    """
+    grid = table.find(f"{W_NS}tblGrid")
+    column_count = len(grid.findall(f"{W_NS}gridCol")) if grid is not None else 0
+    
+    rows = []
+    previous_row = []
+    for tr in table.findall(f"{W_NS}tr"):
+        cells = []
+        for tc in tr.findall(f"{W_NS}tc"):
+            text = "\n".join(_xml_paragraph_text(p) for p in tc.findall(f"{W_NS}p"))
+            span = 1
+            tc_pr = tc.find(f"{W_NS}tcPr")
+            if tc_pr is not None:
+                grid_span = tc_pr.find(f"{W_NS}gridSpan")
+                if grid_span is not None:
+                    span = int(grid_span.get(f"{W_NS}val", "1"))
+                # Продолжение вертикального объединения показывает текст верхней ячейки
+                v_merge = tc_pr.find(f"{W_NS}vMerge")
+                if v_merge is not None and v_merge.get(f"{W_NS}val", "continue") == "continue":
+                    if len(cells) < len(previous_row):
+                        text = previous_row[len(cells)]
+            cells.extend([text] * span)
+        rows.append(cells)
+        previous_row = cells
+    
+    return rows, column_count
+
+def iter_docx_body(file_path: str):
+    """
+    Потоково перебирает элементы тела документа, не строя объектную модель python-docx.
+    
+    Каждый абзац и таблица верхнего уровня освобождаются сразу после обработки,
+    поэтому потребление памяти не зависит от размера документа.
+    
+    Yields:
+        ("paragraph", текст) или ("table", (строки, количество столбцов))
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(_main_document_part(archive)) as stream:
+            depth = 0
+            body = None
+            for event, element in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2 and element.tag == f"{W_NS}body":
+                        body = element
+                    continue
+                
+                depth -= 1
+                if depth == 2 and body is not None:
+                    if element.tag == f"{W_NS}p":
+                        yield "paragraph", _xml_paragraph_text(element)
+                    elif element.tag == f"{W_NS}tbl":
+                        yield "table", _xml_table_rows(element)
+                    body.remove(element)
+
+def get_document_streamed(file_path: str, format_type: str = "text", tables_only: bool = False) -> str:
+    """
+    Возвращает содержимое документа в тех же форматах, что get_document_as_text,
+    get_document_as_json и get_tables_info, используя потоковое извлечение.
+    """
+    paragraphs = []
+    tables = []
+    paragraph_index = 0
+    for kind, value in iter_docx_body(file_path):
+        if kind == "paragraph":
+            if value.strip() and not tables_only:
+                paragraphs.append((paragraph_index, value))
+            paragraph_index += 1
+        else:
+            rows, column_count = value
+            if tables_only:
+                # Для сводки храним только размеры и первую строку таблицы
+                tables.append((len(rows), column_count, rows[0] if rows else None))
+            else:
+                tables.append((rows, column_count))
+    
+    if tables_only:
+        result = [f"Найдено таблиц: {len(tables)}"]
+        for t_idx, (row_count, column_count, header) in enumerate(tables):
+            result.append(f"\nТаблица {t_idx+1}:")
+            result.append(f"  Строк: {row_count}")
+            result.append(f"  Столбцов: {column_count if row_count else 0}")
+            if header is not None:
+                result.append(f"  Заголовок: {' | '.join(text.strip() for text in header)}")
+        return "\n".join(result)
+    
+    if format_type.lower() == 'json':
+        result = {
+            "paragraphs": [{"index": i, "text": text} for i, text in paragraphs],
+            "tables": []
+        }
+        for t_idx, (rows, column_count) in enumerate(tables):
+            table_data = {
+                "index": t_idx,
+                "rows": len(rows),
+                "columns": column_count if rows else 0,
+                "cells": []
+            }
+            for r_idx, row in enumerate(rows):
+                for c_idx, text in enumerate(row):
+                    if text.strip():
+                        table_data["cells"].append({
+                            "row": r_idx,
+                            "column": c_idx,
+                            "text": text.strip()
+                        })
+            result["tables"].append(table_data)
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    
+    full_text = []
+    if paragraphs:
+        full_text.append("=== АБЗАЦЫ ===")
+        full_text.extend(f"[Абзац {i+1}] {text}" for i, text in paragraphs)
+    
+    if tables:
+        full_text.append("\n=== ТАБЛИЦЫ ===")
+        for t_idx, (rows, _) in enumerate(tables):
+            full_text.append(f"\n[Таблица {t_idx+1}]")
+            for r_idx, row in enumerate(rows):
+                row_text = [
+                    f"({r_idx+1},{c_idx+1}): {text.strip()}"
+                    for c_idx, text in enumerate(row) if text.strip()
+                ]
+                if row_text:
+                    full_text.append(" | ".join(row_text))
+    
+    result = "\n".join(full_text)
+    return result if result.strip() else "Документ пустой или не содержит текста."
+
 @mcp.tool()
+@track_peak_memory
 async def edit_docx(
     file_path: str, 
     replacements: Dict[str, str] = None,
     use_regex: bool = False,
     output_path: str = None,
-    append_content: List[Dict[str, Any]] = None  
+    append_content: List[Dict[str, Any]] = None,
+    regex_engine: str = "re",
+    regex_timeout: float = None
 ) -> str:
     """
     Edits a DOCX file by replacing the specified text fragments. 
@@ -253,6 +989,8 @@ async def edit_docx(
                 {"type": "heading", "text": "Заголовок", "level": 1},
                 {"type": "table", "rows": [["ячейка1", "ячейка2"], ["ячейка3", "ячейка4"]]}
             ]
+        regex_engine: Движок регулярных выражений: "re" (по умолчанию), "auto" или "re2" (линейное время, \\w и \\b только ASCII)
+        regex_timeout: Бюджет времени на регулярные замены в секундах (по умолчанию REGEX_TIME_BUDGET)
     """
     try:
         valid, error_msg = validate_file_path(file_path)
@@ -267,23 +1005,41 @@ async def edit_docx(
         else:
             output_path = file_path
         
+        if use_regex and replacements:
+            if regex_engine not in ("auto", "re2", "re"):
+                return f"Ошибка: Неизвестный движок регулярных выражений '{regex_engine}'. Допустимые значения: re, auto, re2"
+            
+            for pattern in replacements:
+                try:
+                    compile_pattern(pattern, regex_engine)
+                except re.error as e:
+                    return f"Ошибка в регулярном выражении '{pattern}': {str(e)}"
+        
+        # Только добавление в конец: дописываем XML без загрузки всего документа
+        if append_content and not replacements:
+            changes_count = append_docx_content_fast(file_path, output_path, append_content)
+            if changes_count is not None:
+                if changes_count > 0:
+                    return f"Файл {'сохранен как ' + output_path if output_path != file_path else file_path + ' обновлен'}. Выполнено изменений: {changes_count}."
+                return f"В файле не было сделано изменений."
+        
+        fits, error_msg = fits_memory_budget(file_path)
+        if not fits:
+            return error_msg
+        
         document = Document(file_path)
         changes_count = 0
+        slow_patterns = []
         
-        #
         if replacements:
             
             if use_regex:
-                
-                compiled_patterns = []
-                for pattern, replacement in replacements.items():
-                    try:
-                        compiled_patterns.append((re.compile(pattern), replacement))
-                    except re.error as e:
-                        return f"Ошибка в регулярном выражении '{pattern}': {str(e)}"
-                
-                
-                changes_count = apply_regex_replacements(document, compiled_patterns)
+                try:
+                    changes_count, slow_patterns = apply_regex_replacements(
+                        document, list(replacements.items()), regex_engine, regex_timeout
+                    )
+                except RegexTimeoutError as e:
+                    return f"Ошибка: Регулярное выражение '{e.pattern}' не уложилось в лимит {e.timeout:g} с. Файл не изменен."
             else:
                 
                 changes_count = apply_text_replacements(document, replacements)
@@ -342,10 +1098,16 @@ async def edit_docx(
         # Сохраняем документ
         document.save(output_path)
         
+        slow_report = ""
+        if slow_patterns:
+            slow_report = "\nМедленные регулярные выражения: " + ", ".join(
+                f"'{pattern}' ({elapsed:.2f} с)" for pattern, elapsed in slow_patterns
+            )
+        
         if changes_count > 0:
-            return f"Файл {'сохранен как ' + output_path if output_path != file_path else file_path + ' обновлен'}. Выполнено изменений: {changes_count}."
+            return f"Файл {'сохранен как ' + output_path if output_path != file_path else file_path + ' обновлен'}. Выполнено изменений: {changes_count}.{slow_report}"
         else:
-            return f"В файле не было сделано изменений."
+            return f"В файле не было сделано изменений.{slow_report}"
     
     except Exception as e:
         return f"Ошибка при редактировании DOCX-файла: {str(e)}"
@@ -387,42 +1149,398 @@ def apply_text_replacements(document: Document, replacements: Dict[str, str]) ->
     
     return changes_count
 
-def apply_regex_replacements(document: Document, compiled_patterns: List[tuple]) -> int:
-    """Применяет замены с использованием регулярных выражений."""
-    changes_count = 0
+def apply_regex_replacements(document: Document, patterns: List[tuple], engine: str = "re", timeout: float = None) -> tuple[int, List[tuple]]:
+    """
+    Применяет замены с использованием регулярных выражений.
     
-    # Заменяем текст в абзацах
-    for paragraph in document.paragraphs:
-        original_text = paragraph.text
-        modified_text = original_text
-        
-        for pattern, replacement in compiled_patterns:
-            modified_text = pattern.sub(replacement, modified_text)
+    Args:
+        document: Документ
+        patterns: Список пар (регулярное выражение, замена)
+        engine: Движок регулярных выражений ("re", "auto" или "re2")
+        timeout: Бюджет времени на все замены в секундах
         
+    Returns:
+        Кортеж (количество измененных абзацев, список медленных выражений)
+    """
+    # Собираем абзацы документа и ячеек таблиц
+    paragraphs = list(document.paragraphs)
+    for table in document.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                paragraphs.extend(cell.paragraphs)
+    
+    original_texts = [paragraph.text for paragraph in paragraphs]
+    modified_texts, slow_patterns = run_guarded_substitutions(original_texts, patterns, engine, timeout)
+    
+    changes_count = 0
+    for paragraph, original_text, modified_text in zip(paragraphs, original_texts, modified_texts):
         if original_text != modified_text:
             paragraph.clear()
             paragraph.add_run(modified_text)
             changes_count += 1
     
-    # Заменяем текст в таблицах
-    for table in document.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    original_text = paragraph.text
-                    modified_text = original_text
-                    
-                    for pattern, replacement in compiled_patterns:
-                        modified_text = pattern.sub(replacement, modified_text)
-                    
-                    if original_text != modified_text:
-                        paragraph.clear()
-                        paragraph.add_run(modified_text)
-                        changes_count += 1
+    return changes_count, slow_patterns
+
+STYLES_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+
+def _part_rels_path(part_name: str) -> str:
+    """Возвращает путь к файлу связей части, например word/_rels/document.xml.rels."""
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+def _read_styles(archive: zipfile.ZipFile, document_part: str) -> Optional[ET.Element]:
+    """Читает часть стилей, связанную с основной частью документа."""
+    try:
+        rels = ET.fromstring(archive.read(_part_rels_path(document_part)))
+    except KeyError:
+        return None
+    
+    for rel in rels.iter(f"{REL_NS}Relationship"):
+        if rel.get("Type") == STYLES_REL and rel.get("TargetMode") != "External":
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(document_part), rel.get("Target")))
+            try:
+                return ET.fromstring(archive.read(target.lstrip("/")))
+            except KeyError:
+                return None
+    return None
+
+def _resolve_paragraph_style(styles: Optional[ET.Element], name: str) -> tuple[bool, Optional[str]]:
+    """
+    Находит идентификатор стиля абзаца так же, как python-docx.
+    
+    Returns:
+        Кортеж (найден, идентификатор стиля или None для стиля по умолчанию)
+    """
+    if styles is None:
+        return False, None
+    
+    internal_name = name.lower() if re.fullmatch(r"Heading [1-9]", name) else name
+    by_name = by_id = None
+    for style in styles.iter(f"{W_NS}style"):
+        style_name = style.find(f"{W_NS}name")
+        if style_name is not None and style_name.get(f"{W_NS}val") == internal_name:
+            by_name = style
+            break
+        if by_id is None and style.get(f"{W_NS}styleId") == name:
+            by_id = style
+    
+    style = by_name if by_name is not None else by_id
+    if style is None or style.get(f"{W_NS}type") != "paragraph":
+        return False, None
+    if style.get(f"{W_NS}default") in ("1", "true", "on"):
+        return True, None
+    return True, style.get(f"{W_NS}styleId")
+
+def _run_xml(text: str) -> str:
+    """Строит XML абзацного прогона w:r, переводя табуляции и переносы строк, как run.text."""
+    if re.search(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", text):
+        raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+    parts = []
+    # Каждый \r и \n дает отдельный w:br, как в _RunContentAppender python-docx
+    for chunk in re.split(r"([\t\r\n])", text):
+        if chunk == "\t":
+            parts.append("<w:tab/>")
+        elif chunk in ("\r", "\n"):
+            parts.append("<w:br/>")
+        elif chunk:
+            space = ' xml:space="preserve"' if chunk != chunk.strip() else ""
+            parts.append(f"<w:t{space}>{xml_escape(chunk)}</w:t>")
+    return f"<w:r>{''.join(parts)}</w:r>" if parts else "<w:r/>"
+
+def _paragraph_xml(text: str, style_id: Optional[str] = None) -> str:
+    """Строит XML абзаца w:p с текстом и, при необходимости, стилем."""
+    properties = ""
+    if style_id:
+        style_val = xml_escape(style_id, {'"': "&quot;"})
+        properties = f'<w:pPr><w:pStyle w:val="{style_val}"/></w:pPr>'
+    # Как и add_paragraph, для пустого текста прогон не добавляется
+    run = _run_xml(text) if text else ""
+    return f"<w:p>{properties}{run}</w:p>"
+
+def _table_xml(rows: List[List[Any]], block_width: int) -> str:
+    """Строит XML таблицы w:tbl так же, как document.add_table с последующим cell.text."""
+    col_count = len(rows[0])
+    col_width = block_width // col_count
+    xml = [
+        "<w:tbl><w:tblPr>"
+        '<w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        "</w:tblPr><w:tblGrid>"
+    ]
+    xml.append(f'<w:gridCol w:w="{col_width}"/>' * col_count)
+    xml.append("</w:tblGrid>")
+    for row_data in rows:
+        xml.append("<w:tr>")
+        for j in range(col_count):
+            xml.append(f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{col_width}"/></w:tcPr>')
+            if j < len(row_data):
+                xml.append(f"<w:p>{_run_xml(str(row_data[j]))}</w:p>")
+            else:
+                xml.append("<w:p/>")
+            xml.append("</w:tc>")
+        xml.append("</w:tr>")
+    xml.append("</w:tbl>")
+    return "".join(xml)
+
+def _find_body_sect_pr(document_xml: bytes, body_end: int) -> Optional[tuple[int, int]]:
+    """
+    Находит w:sectPr верхнего уровня, завершающий тело документа.
+    
+    Returns:
+        Кортеж (начало, конец) или None, если тело не оканчивается на w:sectPr
+    """
+    # w:sectPr тела идет после последнего абзаца или таблицы и сам их не содержит
+    search_start = max(document_xml.rfind(b"</w:p>", 0, body_end), document_xml.rfind(b"</w:tbl>", 0, body_end), 0)
+    depth = 0
+    start = None
+    for match in re.finditer(rb"<w:sectPr(?=[\s>/])[^>]*?(/?)>|</w:sectPr>", document_xml[search_start:body_end]):
+        if match.group(0).startswith(b"</"):
+            depth -= 1
+            if depth == 0:
+                end = search_start + match.end()
+                break
+        else:
+            if depth == 0:
+                start = search_start + match.start()
+            if match.group(1):
+                if depth == 0:
+                    end = search_start + match.end()
+                    break
+            else:
+                depth += 1
+    else:
+        return None
+    
+    if document_xml[end:body_end].strip():
+        return None
+    return start, end
+
+def _block_width(document_xml: bytes, sect_pr: bytes) -> Optional[int]:
+    """
+    Ширина области текста последнего раздела в твипах, как Document._block_width.
+    
+    Returns:
+        Ширина или None, если w:sectPr не удалось разобрать
+    """
+    page_width, left_margin, right_margin = 12240, 1440, 1440
+    if not sect_pr:
+        return page_width - left_margin - right_margin
+    
+    # Фрагмент разбирается с объявлениями пространств имен корневого элемента
+    root = re.search(rb"<w:document\b[^>]*>", document_xml)
+    declarations = b" ".join(re.findall(rb'xmlns(?::\w+)?="[^"]*"', root.group(0))) if root else b""
+    try:
+        element = ET.fromstring(re.sub(rb"^<w:sectPr", b"<w:sectPr " + declarations, sect_pr, count=1))
+        page_size = element.find(f"{W_NS}pgSz")
+        if page_size is not None and int(page_size.get(f"{W_NS}w") or 0):
+            page_width = int(page_size.get(f"{W_NS}w"))
+        margins = element.find(f"{W_NS}pgMar")
+        if margins is not None:
+            # Нулевые поля python-docx тоже заменяет значением по умолчанию
+            left_margin = int(margins.get(f"{W_NS}left") or 0) or left_margin
+            right_margin = int(margins.get(f"{W_NS}right") or 0) or right_margin
+    except (ET.ParseError, ValueError):
+        return None
+    return page_width - left_margin - right_margin
+
+# Пределы формата zip без расширения zip64
+ZIP32_SIZE_LIMIT = 0xFFFFFFFF
+ZIP32_COUNT_LIMIT = 0xFFFF
+
+def _dos_date_time(date_time: tuple) -> tuple[int, int]:
+    """Переводит ZipInfo.date_time в пару (дата, время) формата MS-DOS."""
+    year, month, day, hour, minute, second = date_time
+    return ((year - 1980) << 9) | (month << 5) | day, (hour << 11) | (minute << 5) | (second // 2)
+
+def _copy_compressed_data(source, info: zipfile.ZipInfo, output) -> None:
+    """Копирует сжатые данные части архива без распаковки."""
+    source.seek(info.header_offset)
+    header = source.read(30)
+    if header[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Некорректный локальный заголовок части {info.filename}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source.seek(info.header_offset + 30 + name_length + extra_length)
+    
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = source.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Часть {info.filename} обрезана")
+        output.write(chunk)
+        remaining -= len(chunk)
+
+def _write_appended_archive(archive: zipfile.ZipFile, source, output, document_part: str, document_xml: bytes) -> None:
+    """
+    Записывает архив с новым содержимым основной части.
+    
+    Остальные части копируются сжатыми байтами без распаковки и повторного сжатия,
+    поэтому стоимость не зависит от размера изображений и вложенных объектов.
+    Локальные заголовки и центральный каталог формируются по полям ZipInfo
+    исходного архива. Дополнительные поля (extra) не переносятся, поэтому
+    устаревшие записи zip64 в результат не попадают.
+    """
+    central_directory = []
+    offset = 0
+    for info in archive.infolist():
+        name = info.filename.encode('utf-8' if info.flag_bits & 0x800 else 'cp437')
+        # Размеры известны заранее, поэтому дескриптор данных не нужен
+        flag_bits = info.flag_bits & ~0x08
+        if info.filename == document_part:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            data = compressor.compress(document_xml) + compressor.flush()
+            extract_version = max(info.extract_version, 20)
+            compress_type = zipfile.ZIP_DEFLATED
+            crc, compress_size, file_size = zlib.crc32(document_xml), len(data), len(document_xml)
+        else:
+            data = None
+            extract_version = info.extract_version
+            compress_type = info.compress_type
+            crc, compress_size, file_size = info.CRC, info.compress_size, info.file_size
+        dos_date, dos_time = _dos_date_time(info.date_time)
+        
+        output.write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, extract_version, flag_bits, compress_type,
+            dos_time, dos_date, crc, compress_size, file_size, len(name), 0
+        ) + name)
+        if data is not None:
+            output.write(data)
+        else:
+            _copy_compressed_data(source, info, output)
+        
+        central_directory.append(struct.pack(
+            "<IBBHHHHHIIIHHHHHII", 0x02014b50, info.create_version, info.create_system,
+            extract_version, flag_bits, compress_type, dos_time, dos_date, crc,
+            compress_size, file_size, len(name), 0, len(info.comment), 0,
+            info.internal_attr, info.external_attr, offset
+        ) + name + info.comment)
+        offset += 30 + len(name) + compress_size
+    
+    directory = b"".join(central_directory)
+    output.write(directory)
+    output.write(struct.pack(
+        "<IHHHHIIH", 0x06054b50, 0, 0, len(central_directory), len(central_directory),
+        len(directory), offset, len(archive.comment)
+    ) + archive.comment)
+
+def append_docx_content_fast(file_path: str, output_path: str, append_content: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    Дописывает элементы в конец документа, не строя объектную модель python-docx.
+    
+    Новый XML вставляется перед завершающим w:sectPr в word/document.xml,
+    остальные части архива копируются в сжатом виде как есть.
+    
+    Args:
+        file_path: Путь к исходному DOCX-файлу
+        output_path: Путь для сохранения результата
+        append_content: Список элементов в формате edit_docx
+        
+    Returns:
+        Количество добавленных элементов или None, если документ нужно обработать
+        через python-docx (нестандартная разметка, отсутствующие стили и т.п.)
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        document_part = _main_document_part(archive)
+        document_info = archive.getinfo(document_part)
+        if document_info.file_size > MEMORY_BUDGET_MB * 1024 * 1024:
+            return None
+        
+        # Архивы, которым нужен zip64, оставляем python-docx
+        infos = archive.infolist()
+        if len(infos) >= ZIP32_COUNT_LIMIT or any(
+            max(info.file_size, info.compress_size, info.header_offset) >= ZIP32_SIZE_LIMIT for info in infos
+        ):
+            return None
+        if os.path.getsize(file_path) + document_info.file_size * 2 >= ZIP32_SIZE_LIMIT:
+            return None
+        
+        document_xml = archive.read(document_part)
+        if f'xmlns:w="{W_NS[1:-1]}"'.encode() not in document_xml[:4096]:
+            return None
+        
+        body_end = document_xml.rfind(b"</w:body>")
+        if body_end == -1:
+            return None
+        
+        # Вставляем перед w:sectPr тела документа; без него структура нестандартная
+        sect_pr_span = _find_body_sect_pr(document_xml, body_end)
+        if sect_pr_span is None:
+            return None
+        insert_at = sect_pr_span[0]
+        sect_pr = document_xml[sect_pr_span[0]:sect_pr_span[1]]
+        
+        styles = None
+        new_xml = []
+        changes_count = 0
+        for item in append_content:
+            item_type = item.get('type', 'paragraph')
+            
+            if item_type in ('paragraph', 'heading'):
+                text = item.get('text', '')
+                if not text:
+                    continue
+                style_id = None
+                if item_type == 'heading':
+                    level = item.get('level', 1)
+                    if not 0 <= level <= 9:
+                        raise ValueError("level must be in range 0-9, got %d" % level)
+                    if styles is None:
+                        styles = _read_styles(archive, document_part)
+                    found, style_id = _resolve_paragraph_style(styles, "Title" if level == 0 else "Heading %d" % level)
+                    if not found:
+                        return None
+                new_xml.append(_paragraph_xml(text, style_id))
+                changes_count += 1
+            
+            elif item_type == 'table':
+                rows = item.get('rows', [])
+                if rows and len(rows) > 0 and len(rows[0]) > 0:
+                    block_width = _block_width(document_xml, sect_pr)
+                    if block_width is None:
+                        return None
+                    new_xml.append(_table_xml(rows, block_width))
+                    changes_count += 1
+            
+            elif item_type == 'list':
+                items = item.get('items', [])
+                style = item.get('style', 'bullet')  # 'bullet' или 'number'
+                
+                if items:
+                    if styles is None:
+                        styles = _read_styles(archive, document_part)
+                    found, style_id = _resolve_paragraph_style(styles, 'ListBullet' if style == 'bullet' else 'ListNumber')
+                    if not found:
+                        return None
+                    for list_item in items:
+                        new_xml.append(_paragraph_xml(list_item, style_id))
+                    changes_count += 1
+        
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        
+        if changes_count == 0:
+            if os.path.abspath(output_path) != os.path.abspath(file_path):
+                shutil.copyfile(file_path, output_path)
+            return 0
+        
+        document_xml = document_xml[:insert_at] + "".join(new_xml).encode('utf-8') + document_xml[insert_at:]
+        
+        if os.path.exists(output_path):
+            # Собираем архив во временном файле и переписываем результат на месте,
+            # сохраняя права, владельца и жесткие ссылки, как document.save
+            with tempfile.TemporaryFile() as temp_file, open(file_path, 'rb') as source:
+                _write_appended_archive(archive, source, temp_file, document_part, document_xml)
+                temp_file.seek(0)
+                with open(output_path, 'wb') as output:
+                    shutil.copyfileobj(temp_file, output, 1024 * 1024)
+        else:
+            with open(output_path, 'wb') as output, open(file_path, 'rb') as source:
+                _write_appended_archive(archive, source, output, document_part, document_xml)
     
     return changes_count
 
 @mcp.tool()
+@track_peak_memory
 async def edit_docx_table(file_path: str, table_index: int, operations: List[Dict[str, Any]], output_path: str = None, show_structure: bool = False, dry_run: bool = False) -> str:
     """
     Edits a DOCX file table.
@@ -447,6 +1565,16 @@ async def edit_docx_table(file_path: str, table_index: int, operations: List[Dic
                 return error_msg
         else:
             output_path = file_path
+        
+        if show_structure:
+            cache_key = render_cache.key(file_path, "table_structure", table_index)
+            cached = render_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        fits, error_msg = fits_memory_budget(file_path)
+        if not fits:
+            return error_msg
             
         document = Document(file_path)
         
@@ -479,7 +1607,7 @@ async def edit_docx_table(file_path: str, table_index: int, operations: List[Dic
                     row_content.append(cell_text)
                 structure_info.append(f"| {r_idx:5d} | " + " | ".join(row_content) + " |")
             
-            return "\n".join(structure_info)
+            return render_cache.put(cache_key, "\n".join(structure_info))
         
         if dry_run:
             results = []
@@ -690,6 +1818,7 @@ def update_cell_text(cell, new_text):
     return True  # Изменения сделаны
 
 @mcp.tool()
+@track_peak_memory
 async def create_docx(file_path: str, content: List[Dict[str, Any]], template_path: str = None) -> str:
     """
     Creates a new DOCX file with the specified content. 
@@ -708,6 +1837,9 @@ async def create_docx(file_path: str, content: List[Dict[str, Any]], template_pa
             valid, error_msg = validate_file_path(template_path)
             if not valid:
                 return error_msg
+            fits, error_msg = fits_memory_budget(template_path)
+            if not fits:
+                return error_msg
             document = Document(template_path)
         else:
             document = Document()
@@ -0,0 +1,94 @@
+"""Сравнение быстрого добавления содержимого с python-docx."""
+import os
+import re
+import sys
+import zipfile
+
+import pytest
+
+pytest.importorskip("mcp")
+docx = pytest.importorskip("docx")
+etree = pytest.importorskip("lxml.etree")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import happy_docx
+
+
+CONTENT = [
+    {"type": "paragraph", "text": " Начало\tстроки\r\nновая & <строка> "},
+    {"type": "paragraph", "text": "a\rb\nc"},
+    {"type": "heading", "text": "Заголовок", "level": 2},
+    {"type": "heading", "text": "Титул", "level": 0},
+    {"type": "list", "items": ["один", "", "  три"], "style": "bullet"},
+    {"type": "list", "items": ["первый"], "style": "number"},
+    {"type": "table", "rows": [["a", "b", "c"], ["d"], ["", "e\nf", "g", "h"]]},
+]
+
+
+def _append_with_python_docx(document, content):
+    for item in content:
+        if item["type"] == "paragraph":
+            document.add_paragraph(item["text"])
+        elif item["type"] == "heading":
+            document.add_heading(item["text"], level=item["level"])
+        elif item["type"] == "list":
+            style = "List Bullet" if item["style"] == "bullet" else "List Number"
+            for list_item in item["items"]:
+                document.add_paragraph(list_item, style=style)
+        elif item["type"] == "table":
+            rows = item["rows"]
+            table = document.add_table(rows=len(rows), cols=len(rows[0]))
+            for i, row_data in enumerate(rows):
+                for j, cell_data in enumerate(row_data[:len(rows[0])]):
+                    table.cell(i, j).text = str(cell_data)
+
+
+def _document_xml(path):
+    with zipfile.ZipFile(path) as archive:
+        root = etree.fromstring(archive.read("word/document.xml"))
+    return re.sub(rb">\s+<", b"><", etree.tostring(root, method="c14n"))
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.docx"
+    document = docx.Document()
+    document.add_paragraph("Исходный абзац")
+    document.save(path)
+    return path
+
+
+def test_fast_append_matches_python_docx(source, tmp_path):
+    fast_path = tmp_path / "fast.docx"
+    slow_path = tmp_path / "slow.docx"
+
+    changes = happy_docx.append_docx_content_fast(str(source), str(fast_path), CONTENT)
+    assert changes == len(CONTENT)
+
+    document = docx.Document(source)
+    _append_with_python_docx(document, CONTENT)
+    document.save(slow_path)
+
+    assert _document_xml(fast_path) == _document_xml(slow_path)
+
+
+def test_fast_append_copies_other_parts_unchanged(source, tmp_path):
+    fast_path = tmp_path / "fast.docx"
+    happy_docx.append_docx_content_fast(str(source), str(fast_path), CONTENT)
+
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(fast_path) as result:
+        assert result.testzip() is None
+        assert [info.filename for info in result.infolist()] == [info.filename for info in original.infolist()]
+        for info in original.infolist():
+            if info.filename == "word/document.xml":
+                continue
+            copied = result.getinfo(info.filename)
+            assert (copied.CRC, copied.compress_size, copied.compress_type) == (info.CRC, info.compress_size, info.compress_type)
+
+
+def test_fast_append_in_place(source):
+    for i in range(3):
+        happy_docx.append_docx_content_fast(str(source), str(source), [{"type": "paragraph", "text": f"строка {i}"}])
+
+    texts = [paragraph.text for paragraph in docx.Document(source).paragraphs]
+    assert texts == ["Исходный абзац", "строка 0", "строка 1", "строка 2"]